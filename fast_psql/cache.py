@@ -0,0 +1,163 @@
+"""Read-through entity cache used by the single-item GET routes.
+
+Two backends share one small interface (get / set / delete / clear / stats):
+
+* TTLCache   - in-process, LRU-bounded, per-entry TTL
+* RedisCache - any Redis-compatible client (redis-py, or a fake in tests)
+
+Cached values are the JSON-able dicts a route returns, never ORM objects.
+Configuration comes from the environment, like DATABASE_URL:
+
+    CACHE_BACKEND      memory | redis | none   (default: none)
+    CACHE_TTL          seconds an entry lives  (default: 60)
+    CACHE_MAX_ENTRIES  LRU bound for memory    (default: 10000)
+    REDIS_URL          used when CACHE_BACKEND=redis
+
+Caching is opt-in: with several workers, a memory cache only sees other
+workers' writes through the change feed (CHANGE_FEED), and without it
+serves their stale or deleted rows for up to CACHE_TTL. Use redis, or
+memory with the feed on (or a single worker).
+"""
+from collections import OrderedDict
+import json
+import os
+import threading
+import time
+
+class TTLCache:
+    # Per process: other workers' writes reach it through the change feed
+    shared = False
+
+    def __init__(self, max_entries=10000, ttl=60.0, clock=time.monotonic):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.clock = clock
+        self._data = OrderedDict()  # key -> (expires_at, value), oldest first
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = self.expirations = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, value = entry
+            if expires_at <= self.clock():
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (self.clock() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "backend": "memory",
+                "size": len(self._data),
+                "max_entries": self.max_entries,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+class RedisCache:
+    """Same interface on top of a Redis-compatible client.
+
+    Only get/set(ex=)/delete/scan_iter are used, so a dict-backed fake can
+    stand in for redis-py in tests. Eviction is done by Redis itself
+    (maxmemory policy), so it is not counted here.
+    """
+    # One copy for every worker: the writer's own delete reaches them all
+    shared = True
+
+    def __init__(self, client, ttl=60.0, prefix="cache:"):
+        self.client = client
+        self.ttl = ttl
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self.hits = self.misses = 0
+
+    def get(self, key):
+        raw = self.client.get(self.prefix + key)
+        with self._lock:
+            if raw is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return json.loads(raw)
+
+    def set(self, key, value):
+        self.client.set(self.prefix + key, json.dumps(value), ex=max(1, int(self.ttl)))
+
+    def delete(self, key):
+        self.client.delete(self.prefix + key)
+
+    def clear(self):
+        for key in self.client.scan_iter(match=self.prefix + "*"):
+            self.client.delete(key)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "backend": "redis",
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": None,
+            }
+
+class NullCache:
+    """CACHE_BACKEND=none: every lookup misses, nothing is stored."""
+    shared = False
+
+    def __init__(self):
+        self.misses = 0
+
+    def get(self, key):
+        self.misses += 1
+        return None
+
+    def set(self, key, value):
+        pass
+
+    def delete(self, key):
+        pass
+
+    def clear(self):
+        pass
+
+    def stats(self):
+        return {"backend": "none", "hits": 0, "misses": self.misses, "evictions": 0}
+
+def make_cache(namespace):
+    backend = os.environ.get("CACHE_BACKEND", "none")
+    ttl = float(os.environ.get("CACHE_TTL", 60))
+    if backend == "none":
+        return NullCache()
+    if backend == "redis":
+        # Optional dependency: only needed when the redis backend is selected
+        import redis
+        client = redis.Redis.from_url(os.environ.get("REDIS_URL", "redis://localhost:6379/0"))
+        return RedisCache(client, ttl=ttl, prefix=f"{namespace}:")
+    return TTLCache(max_entries=int(os.environ.get("CACHE_MAX_ENTRIES", 10000)), ttl=ttl)
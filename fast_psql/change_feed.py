@@ -0,0 +1,281 @@
+"""Cross-worker cache invalidation through a change feed, configured from the environment.
+
+    CHANGE_FEED                notify | poll | off                                  (default: off)
+    CHANGE_FEED_POLL_INTERVAL  seconds between reads of change_events (poll mode)  (default: 1)
+    CHANGE_FEED_RETRY          seconds before a lost listener connection is retried (default: 1)
+
+Write routes call publish(session, channel, ids) before they commit, so an
+event becomes visible exactly when its transaction commits and never for a
+rolled-back one. Each worker process runs one listener thread that hands
+the events of every other process to the handlers subscribed for the
+channel ("employees", "books"): they drop the changed ids' cache entries
+and bump list/count generations, so per-process caches can keep long TTLs.
+An event with no ids means rows were added. Handlers get ids=None when the
+listener (re)connects: events sent while it wasn't listening are lost, so
+anything cached may be stale.
+
+Read-through fills guard against changes made while they were reading,
+in this process (wrote()) or elsewhere: they take version() before the
+query and cache inside unchanged(), which holds until the cache is written.
+That works with the feed off too.
+
+notify  pg_notify() in the writing transaction and LISTEN on one dedicated
+        connection per worker, outside the pool. Needs Postgres with
+        psycopg2; anything else falls back to poll. LISTEN doesn't work
+        behind a transaction-pooling pgbouncer: use poll there.
+poll    events are rows in change_events (created by the migrate step), read
+        every CHANGE_FEED_POLL_INTERVAL seconds. The last POLL_LOOKBACK
+        sequence numbers are read again each time, so an event whose
+        transaction commits after a later one's isn't missed; the table is
+        trimmed to the last POLL_KEEP events.
+
+Events applied are counted at /metrics as change_feed_events_total.
+"""
+from collections import defaultdict
+from contextlib import contextmanager
+import json
+import logging
+import os
+from select import select as wait_readable
+import socket
+import threading
+import uuid
+
+from sqlalchemy import Column, Integer, MetaData, String, Table, Text, func, select, text
+
+import metrics
+
+MODES = ("notify", "poll", "off")
+# pg_notify payloads must stay under 8000 bytes: larger id lists are split
+MAX_IDS_PER_EVENT = 500
+POLL_LOOKBACK = 100
+POLL_KEEP = 10000
+# An idle LISTEN connection runs SELECT 1 this often, so a dead one is noticed
+KEEPALIVE_SECONDS = 30
+
+logger = logging.getLogger("change_feed")
+
+metadata = MetaData()
+change_events = Table(
+    "change_events",
+    metadata,
+    Column("seq", Integer, primary_key=True),
+    Column("channel", String(63), nullable=False),
+    Column("origin", String(100), nullable=False),
+    Column("ids", Text, nullable=False),  # JSON array
+)
+
+def migrate(engine):
+    """Create change_events if it doesn't exist (poll mode's event log; unused otherwise)."""
+    metadata.create_all(bind=engine)
+
+class ChangeFeed:
+    def __init__(self, mode="off", poll_interval=1.0, retry=1.0):
+        if mode not in MODES:
+            raise ValueError(f"CHANGE_FEED must be one of {', '.join(MODES)}, not {mode!r}")
+        self.mode = mode
+        self.poll_interval = poll_interval
+        self.retry = retry
+        self.handlers = defaultdict(list)  # channel -> [handler(ids)]
+        self.listening = None  # mode the listener runs in, once started
+        self.connected = False
+        self.connects = 0
+        self.received = 0
+        self._versions = defaultdict(int)
+        self._host = socket.gethostname()
+        self._nonce = uuid.uuid4().hex[:8]
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        # Threads don't survive fork(): start one in each process
+        self._pid = None
+
+    @property
+    def enabled(self):
+        return self.mode != "off"
+
+    @property
+    def origin(self):
+        # Forked workers share the instance (and nonce) but not the pid
+        return f"{self._host}:{os.getpid()}:{self._nonce}"
+
+    def resolve(self, engine):
+        """Mode actually used with engine: notify needs Postgres through psycopg2."""
+        if self.mode == "notify" and (engine.dialect.name, engine.dialect.driver) != ("postgresql", "psycopg2"):
+            return "poll"
+        return self.mode
+
+    def subscribe(self, channel, handler):
+        """Call handler(ids) from the listener thread for other processes' changes to channel."""
+        self.handlers[channel].append(handler)
+
+    def version(self, channel):
+        """Changes to channel committed here or applied from elsewhere so far.
+
+        Read it before a query and cache the rows inside unchanged(): if it
+        moved, they may predate a change that was already applied.
+        """
+        return self._versions[channel]
+
+    def wrote(self, channel):
+        """Count a change this process committed to channel, before refreshing its cache."""
+        with self._lock:
+            self._versions[channel] += 1
+
+    @contextmanager
+    def unchanged(self, channel, version):
+        """Yield whether channel is still at version; cache the rows inside the block.
+
+        wrote() and feed events wait for the block, so a change committed
+        after the check can't be overwritten by the older rows.
+        """
+        with self._lock:
+            yield self._versions[channel] == version
+
+    def publish(self, session, channel, ids=()):
+        """Record a change to ids (none: rows were added) in session's transaction."""
+        if not self.enabled:
+            return
+        conn = session.connection()
+        ids = list(ids)
+        chunks = [ids[i:i + MAX_IDS_PER_EVENT] for i in range(0, len(ids), MAX_IDS_PER_EVENT)] or [[]]
+        if self.resolve(conn.engine) == "notify":
+            for chunk in chunks:
+                payload = json.dumps({"origin": self.origin, "ids": chunk})
+                conn.execute(text("SELECT pg_notify(:channel, :payload)"), {"channel": channel, "payload": payload})
+        else:
+            rows = [{"channel": channel, "origin": self.origin, "ids": json.dumps(chunk)} for chunk in chunks]
+            conn.execute(change_events.insert(), rows)
+
+    # --- LISTENER ---
+    def start(self, engine):
+        """Start this process's listener thread (no-op when off or already running here)."""
+        if not self.enabled or self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self.listening = self.resolve(engine)
+            if self.listening != self.mode:
+                logger.warning("CHANGE_FEED=%s needs Postgres with psycopg2; polling change_events instead", self.mode)
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, args=(engine,), name="change-feed", daemon=True)
+            self._thread.start()
+            self._pid = os.getpid()
+
+    def stop(self, timeout=5.0):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self._thread = self._pid = None
+
+    def _run(self, engine):
+        loop = self._listen if self.listening == "notify" else self._poll
+        while not self._stop.is_set():
+            try:
+                loop(engine)
+            except Exception:
+                logger.exception("change feed listener failed; reconnecting in %s s", self.retry)
+            self.connected = False
+            self._stop.wait(self.retry)
+
+    def _listen(self, engine):
+        pooled = engine.raw_connection()
+        # Held for the life of the worker: detached, it doesn't take up a pool slot
+        pooled.detach()
+        conn = pooled.dbapi_connection
+        try:
+            conn.autocommit = True
+            with conn.cursor() as cursor:
+                for channel in self.handlers:
+                    cursor.execute(f"LISTEN {channel}")
+            self._connected()
+            idle = 0.0
+            while not self._stop.is_set():
+                # Wakes up every poll_interval to notice stop()
+                if not wait_readable([conn], [], [], self.poll_interval)[0]:
+                    idle += self.poll_interval
+                    if idle >= KEEPALIVE_SECONDS:
+                        with conn.cursor() as cursor:
+                            cursor.execute("SELECT 1")
+                        idle = 0.0
+                    continue
+                idle = 0.0
+                conn.poll()
+                while conn.notifies:
+                    notify = conn.notifies.pop(0)
+                    event = json.loads(notify.payload)
+                    self._deliver(notify.channel, event["origin"], event["ids"])
+        finally:
+            conn.close()
+
+    def _poll(self, engine):
+        seq = change_events.c.seq
+        with engine.connect() as conn:
+            last = conn.execute(select(func.max(seq))).scalar() or 0
+            # Covered by the flush _connected() triggers
+            applied = set(conn.execute(select(seq).where(seq > last - POLL_LOOKBACK)).scalars())
+        trimmed = last
+        self._connected()
+        while not self._stop.wait(self.poll_interval):
+            with engine.connect() as conn:
+                rows = conn.execute(
+                    change_events.select().where(seq > last - POLL_LOOKBACK, change_events.c.channel.in_(list(self.handlers))).order_by(seq)
+                ).all()
+                newest = max([last] + [row.seq for row in rows])
+                if newest - last > POLL_KEEP - POLL_LOOKBACK:
+                    # Fell far enough behind that trimming may have removed unseen events
+                    self._connected()
+                else:
+                    for row in rows:
+                        if row.seq not in applied:
+                            applied.add(row.seq)
+                            self._deliver(row.channel, row.origin, json.loads(row.ids))
+                last = newest
+                applied = {applied_seq for applied_seq in applied if applied_seq > last - POLL_LOOKBACK}
+                if last - trimmed >= POLL_KEEP // 10:
+                    conn.execute(change_events.delete().where(seq <= last - POLL_KEEP))
+                    conn.commit()
+                    trimmed = last
+
+    def _connected(self):
+        for channel in list(self.handlers):
+            self._dispatch(channel, None)
+        self.connects += 1
+        self.connected = True
+
+    def _deliver(self, channel, origin, ids):
+        # This process invalidated its own caches when it wrote
+        if origin == self.origin:
+            return
+        self.received += 1
+        metrics.CHANGE_EVENTS.inc((channel,))
+        self._dispatch(channel, ids)
+
+    def _dispatch(self, channel, ids):
+        with self._lock:
+            self._versions[channel] += 1
+        for handler in self.handlers.get(channel, ()):
+            try:
+                handler(ids)
+            except Exception:
+                logger.exception("change feed handler for %s failed", channel)
+
+    def status(self):
+        """Listener state for the /metrics/change-feed endpoints."""
+        return {
+            "mode": self.mode,
+            "listening": self.listening if self._pid == os.getpid() else None,
+            "connected": self.connected,
+            "connects": self.connects,
+            "received": self.received,
+            "channels": sorted(self.handlers),
+        }
+
+def make_change_feed():
+    """ChangeFeed from CHANGE_FEED_* (publishes and listens to nothing while CHANGE_FEED=off)."""
+    return ChangeFeed(
+        os.environ.get("CHANGE_FEED", "off"),
+        float(os.environ.get("CHANGE_FEED_POLL_INTERVAL", 1)),
+        float(os.environ.get("CHANGE_FEED_RETRY", 1)),
+    )
@@ -0,0 +1,106 @@
+"""CSV export/import through Postgres COPY, with constant memory.
+
+copy_out() streams COPY ... TO STDOUT as it arrives: psycopg2 only writes
+COPY output into a file object, so a background thread runs copy_expert()
+into a bounded queue and the generator yields from it. At most
+COPY_MAX_CHUNKS chunks of COPY_CHUNK_BYTES are buffered, so a slow client
+slows the COPY down instead of growing memory.
+
+copy_in() feeds a file object (request body, spooled upload) to COPY ...
+FROM STDIN, which reads it COPY_CHUNK_BYTES at a time.
+
+    COPY_CHUNK_BYTES   bytes per chunk read or yielded   (default: 65536)
+    COPY_MAX_CHUNKS    chunks buffered by copy_out()     (default: 16)
+"""
+import os
+import queue
+import threading
+
+CHUNK_BYTES = int(os.environ.get("COPY_CHUNK_BYTES", 65536))
+MAX_CHUNKS = int(os.environ.get("COPY_MAX_CHUNKS", 16))
+
+class CopyCancelled(Exception):
+    pass
+
+class _QueueWriter:
+    """File object for copy_expert(): batches COPY rows into chunks on a queue."""
+    def __init__(self, chunks, cancelled):
+        self.chunks = chunks
+        self.cancelled = cancelled
+        self.buffer = bytearray()
+
+    def write(self, data):
+        # psycopg2 writes one COPY row per call
+        self.buffer += data
+        if len(self.buffer) >= CHUNK_BYTES:
+            self.put(bytes(self.buffer))
+            self.buffer.clear()
+        return len(data)
+
+    def put(self, item):
+        # Poll so a client that went away stops the COPY instead of blocking it forever
+        while not self.cancelled.is_set():
+            try:
+                self.chunks.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                pass
+        raise CopyCancelled()
+
+def copy_out(conn, sql):
+    """Yield COPY ... TO STDOUT output of sql as bytes chunks.
+
+    conn is a SQLAlchemy Connection; if the generator is closed before the
+    COPY finished (client disconnect), the connection is invalidated rather
+    than returned to the pool mid-COPY.
+    """
+    chunks = queue.Queue(MAX_CHUNKS)
+    cancelled = threading.Event()
+    done = object()
+    writer = _QueueWriter(chunks, cancelled)
+
+    def run():
+        try:
+            with conn.connection.cursor() as cursor:
+                cursor.copy_expert(sql, writer, CHUNK_BYTES)
+            if writer.buffer:
+                writer.put(bytes(writer.buffer))
+            writer.put(done)
+        except CopyCancelled:
+            pass
+        except Exception as e:
+            try:
+                writer.put(e)
+            except CopyCancelled:
+                pass
+
+    thread = threading.Thread(target=run, name="copy-out", daemon=True)
+    thread.start()
+    finished = False
+    try:
+        while True:
+            item = chunks.get()
+            if item is done:
+                finished = True
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        cancelled.set()
+        thread.join()
+        if not finished:
+            conn.invalidate()
+
+def copy_in(conn, sql, source):
+    """Run COPY ... FROM STDIN reading source; returns the rows copied.
+
+    Malformed input (wrong column count, bad values, bad encoding) raises
+    ValueError with Postgres' message; the transaction needs a rollback.
+    """
+    try:
+        with conn.connection.cursor() as cursor:
+            cursor.copy_expert(sql, source, CHUNK_BYTES)
+            return cursor.rowcount
+    except conn.dialect.dbapi.DataError as e:
+        raise ValueError(str(e).strip())
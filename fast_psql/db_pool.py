@@ -0,0 +1,143 @@
+"""Connection pool settings from the environment, plus live pool metrics.
+
+    DB_POOL_SIZE       connections kept open             (default: 5)
+    DB_MAX_OVERFLOW    extra connections under bursts    (default: 10)
+    DB_POOL_TIMEOUT    seconds to wait for a checkout    (default: 30)
+    DB_POOL_RECYCLE    reconnect after N seconds, -1 off (default: 1800)
+    DB_POOL_PRE_PING   test connections on checkout      (default: 1)
+    DB_POOL_WARM       connections opened by /readyz     (default: pool size)
+
+MeteredQueuePool times every checkout wait into a histogram and counts
+checkout timeouts, so pool exhaustion shows up before requests fail.
+"""
+import os
+import threading
+import time
+import weakref
+
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool
+
+# Upper bounds (seconds) of the checkout wait histogram buckets
+WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0)
+
+class PoolMetrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_sum = 0.0
+        self.wait_max = 0.0
+        self.wait_counts = [0] * (len(WAIT_BUCKETS) + 1)  # last slot is +Inf
+
+    def observe(self, waited, timed_out=False):
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+            self.wait_sum += waited
+            self.wait_max = max(self.wait_max, waited)
+            for i, bound in enumerate(WAIT_BUCKETS):
+                if waited <= bound:
+                    self.wait_counts[i] += 1
+                    break
+            else:
+                self.wait_counts[-1] += 1
+
+    def snapshot(self):
+        """Cumulative (Prometheus-style) bucket counts keyed by upper bound."""
+        with self._lock:
+            buckets, running = {}, 0
+            for bound, count in zip(WAIT_BUCKETS + ("+Inf",), self.wait_counts):
+                running += count
+                buckets[str(bound)] = running
+            return {
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "wait_seconds": {
+                    "buckets": buckets,
+                    "count": running,
+                    "sum": round(self.wait_sum, 6),
+                    "max": round(self.wait_max, 6),
+                },
+            }
+
+class MeteredQueuePool(QueuePool):
+    def __init__(self, *args, **kw):
+        super().__init__(*args, **kw)
+        self.metrics = PoolMetrics()
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            conn = super()._do_get()
+        except PoolTimeoutError:
+            self.metrics.observe(time.perf_counter() - start, timed_out=True)
+            raise
+        self.metrics.observe(time.perf_counter() - start)
+        return conn
+
+    def recreate(self):
+        # engine.dispose() swaps in a fresh pool; keep the counters running
+        pool = super().recreate()
+        pool.metrics = self.metrics
+        return pool
+
+def pool_settings(url):
+    """create_engine() keyword arguments for url, read from the environment."""
+    if url.startswith("sqlite"):
+        # SQLite keeps its own pool classes; only pre-ping applies
+        return {"pool_pre_ping": os.environ.get("DB_POOL_PRE_PING", "1") == "1"}
+    return {
+        "poolclass": MeteredQueuePool,
+        "pool_size": int(os.environ.get("DB_POOL_SIZE", 5)),
+        "max_overflow": int(os.environ.get("DB_MAX_OVERFLOW", 10)),
+        "pool_timeout": float(os.environ.get("DB_POOL_TIMEOUT", 30)),
+        "pool_recycle": int(os.environ.get("DB_POOL_RECYCLE", 1800)),
+        "pool_pre_ping": os.environ.get("DB_POOL_PRE_PING", "1") == "1",
+    }
+
+def pool_status(engine):
+    """Live view of engine's pool for the /metrics/pool endpoints."""
+    pool = engine.pool
+    status = {"pool_class": type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        status.update({
+            "pool_size": pool.size(),
+            "max_overflow": pool._max_overflow,
+            "timeout": pool.timeout(),
+            "checked_out": pool.checkedout(),
+            "checked_in": pool.checkedin(),
+            "overflow": max(pool.overflow(), 0),
+        })
+    if isinstance(pool, MeteredQueuePool):
+        status.update(pool.metrics.snapshot())
+    return status
+
+# Pools already warmed by check_ready(); engine.dispose() swaps in a new pool,
+# which gets warmed again
+_warmed_pools = weakref.WeakSet()
+
+def check_ready(engine):
+    """Readiness probe: raises unless the database answers.
+
+    The first successful probe per pool also opens DB_POOL_WARM connections
+    and hands them back, so the first real requests skip connection setup.
+    """
+    pool = engine.pool
+    warmed = 0
+    if pool not in _warmed_pools:
+        size = pool.size() if isinstance(pool, QueuePool) else 1
+        conns = []
+        try:
+            for _ in range(min(int(os.environ.get("DB_POOL_WARM", size)), size)):
+                conns.append(engine.connect())
+        finally:
+            for conn in conns:
+                conn.close()
+        warmed = len(conns)
+        _warmed_pools.add(pool)
+    with engine.connect() as conn:
+        conn.exec_driver_sql("SELECT 1")
+    return {"status": "ready", "warmed_connections": warmed}
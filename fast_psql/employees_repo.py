@@ -0,0 +1,172 @@
+"""Employee model and every query main.py runs against it.
+
+Routes call these functions instead of building ORM Query objects per
+request:
+
+- Each statement shape is built once: at import (module-level statements,
+  PreparedQuery fallbacks) or as a lambda_stmt, which SQLAlchemy constructs
+  on the first call and afterwards only re-extracts the bound values from.
+  Either way the compiled SQL comes from the engine's statement cache.
+- Fetch by id, multi-get and single creates are server-side prepared
+  statements on Postgres (see prepared.py).
+- Sort fields resolve through the SORT_COLUMNS whitelist, never getattr().
+- Reads can select a subset of FIELDS (?fields=); each subset's statements
+  are built once and reused.
+
+Functions take a Session and never commit; transactions stay with the caller.
+"""
+import functools
+
+from sqlalchemy import ARRAY, Column, Index, Integer, String, UniqueConstraint, any_, bindparam, lambda_stmt, select, tuple_, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session, declarative_base
+
+from prepared import PreparedQuery
+
+Base = declarative_base()
+
+class Employee(Base):
+    __tablename__ = "employees"
+
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String, nullable=False)
+    role = Column(String, nullable=False)
+
+    # (name, role) is unique: creates rely on INSERT ... ON CONFLICT DO NOTHING.
+    # (sort column, id) indexes back the keyset seek in GET /employees/page.
+    # Existing databases need the constraint added by hand (create_all skips
+    # existing tables):
+    #   ALTER TABLE employees ADD CONSTRAINT uq_employees_name_role UNIQUE (name, role);
+    __table_args__ = (
+        UniqueConstraint("name", "role", name="uq_employees_name_role"),
+        Index("ix_employees_name_id", "name", "id"),
+        Index("ix_employees_role_id", "role", "id"),
+    )
+
+# Columns the cursor-paginated listing can be sorted on
+SORT_COLUMNS = {"id": Employee.id, "name": Employee.name, "role": Employee.role}
+
+def employee_dict(emp) -> dict:
+    # Same field order as EmployeeResponse; emp is a model instance or a row
+    return {"name": emp.name, "role": emp.role, "id": emp.id}
+
+# Fields ?fields= can select, in EmployeeResponse order
+FIELDS = ("name", "role", "id")
+
+def parse_fields(value):
+    """Validate a ?fields= value: a tuple in FIELDS order, or None for every field.
+
+    Raises ValueError naming the unknown fields.
+    """
+    if value is None:
+        return None
+    requested = {part.strip() for part in value.split(",") if part.strip()}
+    unknown = requested.difference(FIELDS)
+    if unknown:
+        raise ValueError(f"Unknown fields: {','.join(sorted(unknown))} (choose from {','.join(FIELDS)})")
+    if not requested:
+        raise ValueError(f"fields must name at least one of {','.join(FIELDS)}")
+    if len(requested) == len(FIELDS):
+        return None
+    return tuple(name for name in FIELDS if name in requested)
+
+# --- STATEMENTS ---
+employees = Employee.__table__
+# Same column order as EmployeeResponse, so rows serialize unchanged
+COLUMNS = (employees.c.name, employees.c.role, employees.c.id)
+
+@functools.lru_cache(maxsize=None)
+def select_fields(fields, shape="all"):
+    """SELECT of just these fields, built once per (fields, shape).
+
+    shape: "all" (unordered), "in_id_order" or "by_id" (WHERE id = :id).
+    """
+    stmt = select(*(employees.c[name] for name in fields))
+    if shape == "in_id_order":
+        return stmt.order_by(employees.c.id)
+    if shape == "by_id":
+        return stmt.where(employees.c.id == bindparam("id"))
+    return stmt
+
+BY_ID = PreparedQuery(
+    "employees_by_id", (("id", "integer"),),
+    "SELECT name, role, id FROM employees WHERE id = $1",
+    select(*COLUMNS).where(employees.c.id == bindparam("id")),
+)
+BY_IDS = PreparedQuery(
+    "employees_by_ids", (("ids", "integer[]"),),
+    "SELECT name, role, id FROM employees WHERE id = ANY($1)",
+    select(*COLUMNS).where(employees.c.id == any_(bindparam("ids", type_=ARRAY(Integer)))),
+)
+# No row back means (name, role) already existed
+CREATE = PreparedQuery(
+    "employees_create", (("name", "text"), ("role", "text")),
+    "INSERT INTO employees (name, role) VALUES ($1, $2) ON CONFLICT DO NOTHING RETURNING name, role, id",
+    insert(employees).on_conflict_do_nothing().returning(*COLUMNS),
+)
+# executemany: VALUES come from the parameter dicts
+INSERT_MANY = insert(employees).on_conflict_do_nothing().returning(*COLUMNS)
+# SET comes from the parameter keys other than emp_id
+UPDATE = update(employees).where(employees.c.id == bindparam("emp_id")).returning(*COLUMNS)
+
+# --- QUERIES ---
+def get_employee(db: Session, emp_id: int, fields=None):
+    """Row (name, role, id), or just fields, or None."""
+    if fields is not None:
+        return db.execute(select_fields(fields, "by_id"), {"id": emp_id}).first()
+    return BY_ID.execute(db.connection(), {"id": emp_id}).first()
+
+def get_employees(db: Session, ids: list[int]) -> list:
+    """Rows for the ids that exist, in no particular order."""
+    return BY_IDS.execute(db.connection(), {"ids": ids}).all()
+
+def list_employees(db: Session, fields=None) -> list:
+    return db.execute(select_fields(fields or FIELDS)).all()
+
+def iter_employee_batches(db: Session, batch_size: int, fields=None):
+    """Yield lists of rows (all fields or just fields) in id order, batch_size at a time.
+
+    yield_per turns on stream_results, so rows come from a server-side
+    cursor instead of being buffered in full by the driver.
+    """
+    stmt = select_fields(fields or FIELDS, "in_id_order")
+    return db.execute(stmt, execution_options={"yield_per": batch_size}).partitions()
+
+def page_employees(db: Session, sort: str, order: str, limit: int, after=None) -> list:
+    """Up to limit rows sorted by (sort, id), past the (value, last_id) cursor if given."""
+    column = SORT_COLUMNS[sort]
+    stmt = select(*COLUMNS)
+    # Seek past the cursor with WHERE (sort_col, id) > (...) instead of OFFSET
+    if after is not None:
+        value, last_id = after
+        if sort == "id":
+            key, bound = Employee.id, last_id
+        else:
+            key, bound = tuple_(column, Employee.id), tuple_(value, last_id)
+        stmt = stmt.where(key > bound if order == "asc" else key < bound)
+    if order == "asc":
+        stmt = stmt.order_by(column.asc(), Employee.id.asc())
+    else:
+        stmt = stmt.order_by(column.desc(), Employee.id.desc())
+    return db.execute(stmt.limit(limit)).all()
+
+# --- WRITES ---
+def create_employee(db: Session, name: str, role: str):
+    """Inserted row, or None when (name, role) already exists."""
+    return CREATE.execute(db.connection(), {"name": name, "role": role}).first()
+
+def insert_employees(db: Session, pairs) -> dict:
+    """executemany INSERT ... ON CONFLICT DO NOTHING RETURNING of (name, role) pairs.
+
+    Returns {(name, role): row} for the rows created; pairs must be distinct.
+    """
+    rows = [{"name": name, "role": role} for name, role in pairs]
+    return {(row.name, row.role): row for row in db.execute(INSERT_MANY, rows)}
+
+def update_employee(db: Session, emp_id: int, name: str, role: str):
+    """Updated row, or None if emp_id doesn't exist; raises IntegrityError on a duplicate."""
+    return db.execute(UPDATE, {"emp_id": emp_id, "name": name, "role": role}).first()
+
+def delete_employee(db: Session, emp_id: int) -> bool:
+    stmt = lambda_stmt(lambda: employees.delete().where(employees.c.id == emp_id).returning(employees.c.id))
+    return db.execute(stmt).first() is not None
@@ -0,0 +1,60 @@
+"""Production serving for the employees API: gunicorn managing uvicorn workers.
+
+    gunicorn -c gunicorn.conf.py main:app         # or async_main:app
+
+Everything is read from the environment:
+
+    WEB_CONCURRENCY            worker processes          (default: CPUs)
+    GUNICORN_BIND              listen address            (default: 0.0.0.0:$PORT, PORT default 8000)
+    GUNICORN_TIMEOUT           seconds before an unresponsive worker is killed (default: 30)
+    GUNICORN_GRACEFUL_TIMEOUT  seconds in-flight requests get to finish on shutdown (default: 30)
+    GUNICORN_KEEPALIVE         seconds to hold idle keep-alive connections (default: 5)
+    GUNICORN_MAX_REQUESTS      recycle a worker after N requests, 0 off (default: 0)
+
+The app is imported once in the master (preload) and forked; importing it
+opens no connections, and each worker still drops any inherited pool
+after the fork. SIGTERM stops accepting connections and lets in-flight
+requests drain for GUNICORN_GRACEFUL_TIMEOUT seconds before workers exit.
+Each worker keeps its own DB_POOL_SIZE connections and its own /metrics.
+"""
+import multiprocessing
+import os
+import sys
+
+bind = os.environ.get("GUNICORN_BIND", f"0.0.0.0:{os.environ.get('PORT', 8000)}")
+# Each uvicorn worker runs an event loop (plus a threadpool for sync routes),
+# so one per CPU is enough
+workers = int(os.environ.get("WEB_CONCURRENCY", multiprocessing.cpu_count()))
+worker_class = "uvicorn_worker.UvicornWorker"
+preload_app = True
+
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 30))
+graceful_timeout = int(os.environ.get("GUNICORN_GRACEFUL_TIMEOUT", 30))
+keepalive = int(os.environ.get("GUNICORN_KEEPALIVE", 5))
+max_requests = int(os.environ.get("GUNICORN_MAX_REQUESTS", 0))
+max_requests_jitter = max_requests // 10
+
+accesslog = "-"
+
+def _engines():
+    # Whichever app was preloaded: main.engine (+ read replicas), async_main.async_engine
+    engines = []
+    if "main" in sys.modules:
+        engines.append(sys.modules["main"].engine)
+        engines.extend(sys.modules["main"].replicas.engines)
+    if "async_main" in sys.modules:
+        engines.append(sys.modules["async_main"].async_engine.sync_engine)
+    return engines
+
+def post_fork(server, worker):
+    # Pooled connections are sockets: one shared across processes corrupts
+    # both sides. close=False leaves the parent's connections alone.
+    for engine in _engines():
+        engine.dispose(close=False)
+
+def worker_exit(server, worker):
+    # Close this worker's connections instead of leaving them to time out.
+    # asyncpg connections belong to the worker's event loop, already stopped here.
+    if "main" in sys.modules:
+        for engine in [sys.modules["main"].engine] + sys.modules["main"].replicas.engines:
+            engine.dispose()
@@ -0,0 +1,47 @@
+"""orjson encoding for the JSON_FAST_PATH=1 list responses.
+
+orjson is an optional dependency (pip install orjson), only imported when
+the fast path is switched on. Its output matches json.dumps byte for byte
+except in a few cases, and dumps() falls back to json.dumps for each of
+them, so switching the fast path on never changes a response body:
+
+* very small or large floats (json "1e-05" and "1e+16", orjson "0.00001" and "1e16")
+* non-ASCII text when the caller wants ensure_ascii
+* anything orjson refuses (non-str keys, ints beyond 64 bits)
+"""
+import importlib.util
+import json
+import re
+
+from fastapi.responses import JSONResponse
+
+# Every float orjson writes differently from json.dumps matches this; text that
+# merely looks like one costs a fallback, never a wrong byte
+_FLOAT_MISMATCH = re.compile(rb"[0-9]e[-0-9]|0\.0000")
+
+def require_orjson():
+    """Fail at startup, not on every list request, when JSON_FAST_PATH=1 lacks orjson."""
+    if importlib.util.find_spec("orjson") is None:
+        raise RuntimeError("JSON_FAST_PATH=1 needs orjson: pip install orjson, or unset JSON_FAST_PATH")
+
+def dumps(obj, sort_keys=False, ensure_ascii=False, default=None):
+    """orjson bytes for obj, or None where json.dumps would write something else."""
+    import orjson
+
+    option = orjson.OPT_SORT_KEYS if sort_keys else 0
+    try:
+        data = orjson.dumps(obj, default=default, option=option)
+    except orjson.JSONEncodeError:
+        return None
+    if ensure_ascii and not data.isascii():
+        return None
+    if _FLOAT_MISMATCH.search(data):
+        return None
+    return data
+
+class ORJSONResponse(JSONResponse):
+    """JSONResponse rendered by orjson; same bytes as JSONResponse.render."""
+
+    def render(self, content):
+        data = dumps(content)
+        return data if data is not None else super().render(content)
@@ -0,0 +1,13 @@
+"""Create the schema: run once per deploy, before starting the workers.
+
+    python migrate.py
+
+Importing main (or async_main) never connects or issues DDL, so this is
+the only step that needs the database up. Tables that already exist are
+left alone; see the Employee model for constraints added by hand.
+"""
+from main import DATABASE_URL, migrate
+
+if __name__ == "__main__":
+    migrate()
+    print(f"Schema ready on {DATABASE_URL.rsplit('@', 1)[-1]}")
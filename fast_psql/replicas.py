@@ -0,0 +1,93 @@
+"""Optional read replicas for GET routes, configured from the environment.
+
+    DATABASE_REPLICA_URLS   comma-separated replica URLs; unset keeps every read on the primary
+    REPLICA_CHECK_INTERVAL  seconds between health checks of a replica    (default: 5)
+    REPLICA_STICKY_SECONDS  seconds a client reads from the primary after it writes (default: 5)
+
+Reads go round-robin to the replicas that passed their last health check
+(a SELECT 1), and fall back to the primary when none did. The first read
+that finds a replica's last check too old runs the next one; meanwhile other
+reads use the previous result. Add ?connect_timeout=N to a replica URL so a
+replica that doesn't answer can't hold up that read for long.
+
+Read-your-writes: a successful write sets the read_primary cookie for
+REPLICA_STICKY_SECONDS. Reads that send the cookie back go to the primary,
+so they can't land on a replica that hasn't caught up yet. Writes always use
+the primary.
+"""
+import itertools
+import os
+import threading
+import time
+
+from sqlalchemy import create_engine
+
+from db_pool import pool_settings
+import metrics
+
+STICKY_COOKIE = "read_primary"
+STICKY_SECONDS = int(os.environ.get("REPLICA_STICKY_SECONDS", 5))
+
+class Replica:
+    def __init__(self, engine):
+        self.engine = engine
+        self.healthy = False
+        self.checked_at = None  # time.monotonic() of the last check
+        self.lock = threading.Lock()
+
+class ReplicaSet:
+    def __init__(self, urls, check_interval=5.0):
+        self.replicas = [Replica(create_engine(url, **pool_settings(url))) for url in urls]
+        self.check_interval = check_interval
+        self._next = itertools.count()
+
+    @property
+    def engines(self):
+        return [replica.engine for replica in self.replicas]
+
+    def choose(self, sticky=False):
+        """Engine for one read: the next healthy replica, or None to use the primary."""
+        if not self.replicas:
+            return None
+        if sticky:
+            metrics.REPLICA_READS.inc(("primary_sticky",))
+            return None
+        start = next(self._next)
+        for offset in range(len(self.replicas)):
+            replica = self.replicas[(start + offset) % len(self.replicas)]
+            if self._healthy(replica):
+                metrics.REPLICA_READS.inc(("replica",))
+                return replica.engine
+        metrics.REPLICA_READS.inc(("primary_fallback",))
+        return None
+
+    def _healthy(self, replica):
+        due = replica.checked_at is None or time.monotonic() - replica.checked_at >= self.check_interval
+        # One read re-checks a replica at a time; the others keep the last result
+        if due and replica.lock.acquire(blocking=False):
+            try:
+                with replica.engine.connect() as conn:
+                    conn.exec_driver_sql("SELECT 1")
+                replica.healthy = True
+            except Exception:
+                replica.healthy = False
+            finally:
+                replica.checked_at = time.monotonic()
+                replica.lock.release()
+        return replica.healthy
+
+    def status(self):
+        """Per-replica health for the /metrics/replicas endpoints (passwords masked)."""
+        return [
+            {
+                "url": replica.engine.url.render_as_string(hide_password=True),
+                "healthy": replica.healthy,
+                "checked": replica.checked_at is not None,
+            }
+            for replica in self.replicas
+        ]
+
+def make_replicas():
+    """ReplicaSet from DATABASE_REPLICA_URLS (empty when unset)."""
+    urls = [url.strip() for url in os.environ.get("DATABASE_REPLICA_URLS", "").split(",") if url.strip()]
+    return ReplicaSet(urls, float(os.environ.get("REPLICA_CHECK_INTERVAL", 5)))
@@ -0,0 +1,40 @@
+"""Pydantic request/response schemas of the employees API.
+
+Shared by main.py and async_main.py; importing this module builds no
+engine, app or listener.
+"""
+from typing import Optional
+
+from pydantic import BaseModel
+
+class EmployeeBase(BaseModel):
+    name: str
+    role: str
+
+class EmployeeResponse(EmployeeBase):
+    id: int
+
+    class Config:
+        orm_mode = True
+
+class EmployeePage(BaseModel):
+    items: list[EmployeeResponse]
+    next_cursor: Optional[str] = None
+
+class BulkItemResult(BaseModel):
+    index: int
+    status: str  # "created" | "conflict" | "invalid"
+    id: Optional[int] = None
+    errors: Optional[list[str]] = None
+
+class BulkResponse(BaseModel):
+    created: int
+    conflicts: int
+    invalid: int
+    results: list[BulkItemResult]
+
+class ImportResponse(BaseModel):
+    rows: int
+    created: int
+    conflicts: int
+    invalid: int
@@ -0,0 +1,122 @@
+"""Admission control for DB-bound routes, configured from the environment.
+
+    ADMISSION_LIMIT          requests running at once per worker, 0 off      (default: 0)
+    ADMISSION_QUEUE          requests waiting for a slot beyond that         (default: 2 x limit)
+    ADMISSION_QUEUE_TIMEOUT  seconds a request may wait for a slot           (default: 5)
+    ADMISSION_RETRY_AFTER    Retry-After seconds sent with a 503             (default: 1)
+
+Each limited route has a priority: high (single-item reads), normal
+(writes, paginated reads) or low (full-table lists, bulk writes). A free
+slot goes to the highest-priority waiter, oldest first. When the queue is
+full a newcomer displaces the newest waiter of a lower priority, or is
+rejected itself. Rejected requests raise Overloaded, which the apps turn
+into 503 + Retry-After, so a slow database sheds load in milliseconds
+instead of tying workers up until DB_POOL_TIMEOUT.
+
+Keep ADMISSION_LIMIT at or below DB_POOL_SIZE + DB_MAX_OVERFLOW so admitted
+requests don't queue again on pool checkout.
+"""
+import heapq
+import itertools
+import os
+import threading
+import time
+
+import metrics
+
+PRIORITIES = {'high': 0, 'normal': 1, 'low': 2}
+
+class Overloaded(Exception):
+    def __init__(self, reason, retry_after):
+        super().__init__(f'Server overloaded ({reason}), retry in {retry_after}s')
+        self.reason = reason
+        self.retry_after = retry_after
+
+class AdmissionController:
+    def __init__(self, limit, max_queue, queue_timeout=5.0, retry_after=1):
+        self.limit = limit
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.retry_after = retry_after
+        self.active = 0
+        self.admitted = 0
+        self.shed = {}  # "priority/reason" -> count
+        self._waiters = []  # heap of [rank, seq, priority, shed reason or None]
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+
+    @property
+    def enabled(self):
+        return self.limit > 0
+
+    def acquire(self, priority):
+        """Take a slot, waiting in the queue if needed; raises Overloaded when shed."""
+        with self._cond:
+            if self.active < self.limit and not self._waiters:
+                self.active += 1
+                self.admitted += 1
+                return
+            entry = [PRIORITIES[priority], next(self._seq), priority, None]
+            if len(self._waiters) >= self.max_queue:
+                # Newest waiter of the lowest priority goes first
+                victim = max(self._waiters) if self._waiters else None
+                if victim is None or victim[0] <= entry[0]:
+                    self._shed(priority, 'queue_full')
+                self._waiters.remove(victim)
+                heapq.heapify(self._waiters)
+                victim[3] = 'displaced'
+                self._cond.notify_all()
+            heapq.heappush(self._waiters, entry)
+            deadline = time.monotonic() + self.queue_timeout
+            while entry[3] is None and not (self._waiters[0] is entry and self.active < self.limit):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._waiters.remove(entry)
+                    heapq.heapify(self._waiters)
+                    # The next waiter may be able to run now
+                    self._cond.notify_all()
+                    self._shed(priority, 'timeout')
+                self._cond.wait(remaining)
+            if entry[3] is not None:
+                self._shed(priority, entry[3])
+            heapq.heappop(self._waiters)
+            self.active += 1
+            self.admitted += 1
+            self._cond.notify_all()
+
+    def release(self):
+        with self._cond:
+            self.active -= 1
+            self._cond.notify_all()
+
+    def _shed(self, priority, reason):
+        key = f'{priority}/{reason}'
+        self.shed[key] = self.shed.get(key, 0) + 1
+        metrics.ADMISSION_SHED.inc((priority, reason))
+        raise Overloaded(reason, self.retry_after)
+
+    def status(self):
+        """Live view for the /metrics/admission endpoints."""
+        with self._cond:
+            queued = {name: 0 for name in PRIORITIES}
+            for entry in self._waiters:
+                queued[entry[2]] += 1
+            return {
+                'limit': self.limit,
+                'max_queue': self.max_queue,
+                'active': self.active,
+                'queued': sum(queued.values()),
+                'queued_by_priority': queued,
+                'admitted': self.admitted,
+                'shed': dict(self.shed),
+            }
+
+def make_admission():
+    """AdmissionController from ADMISSION_* (disabled when ADMISSION_LIMIT is 0)."""
+    limit = int(os.environ.get('ADMISSION_LIMIT', 0))
+    return AdmissionController(
+        limit,
+        int(os.environ.get('ADMISSION_QUEUE', 2 * limit)),
+        float(os.environ.get('ADMISSION_QUEUE_TIMEOUT', 5)),
+        int(os.environ.get('ADMISSION_RETRY_AFTER', 1)),
+    )
@@ -0,0 +1,201 @@
+"""Book model and every query app.py and new_flask/app.py run against it.
+
+Both apps pass this module's metadata to SQLAlchemy(), so db.create_all()
+and db.drop_all() still manage the table. Routes call these functions
+instead of building ORM Query objects (Book.query...) per request:
+
+- Each statement shape is built once: at import (module-level statements,
+  PreparedQuery fallbacks) or as a lambda_stmt, which SQLAlchemy constructs
+  on the first call and afterwards only re-extracts the bound values from.
+  Either way the compiled SQL comes from the engine's statement cache.
+- Fetch by id, multi-get and single creates are server-side prepared
+  statements on Postgres (see prepared.py).
+- Sort fields resolve through the SORT_COLUMNS whitelist, never getattr().
+- Reads can select a subset of FIELDS (?fields=); each subset's statements
+  are built once and reused.
+
+Functions take a Session and never commit; transactions stay with the caller.
+"""
+import functools
+
+from sqlalchemy import ARRAY, Column, Index, Integer, String, UniqueConstraint, any_, bindparam, func, lambda_stmt, select, tuple_, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import declarative_base
+
+from prepared import PreparedQuery
+
+Base = declarative_base()
+metadata = Base.metadata
+
+# Longest title / author the columns hold
+MAX_LENGTH = 100
+
+class Book(Base):
+    __tablename__ = 'books'
+    id = Column(Integer, primary_key=True)
+    title = Column(String(MAX_LENGTH), nullable=False)
+    author = Column(String(MAX_LENGTH), nullable=False)
+
+    # (title, author) is unique: creates rely on INSERT ... ON CONFLICT DO NOTHING.
+    # Composite (sort column, id) indexes back the sorted and keyset-paginated
+    # listing; Postgres scans them backwards for 'desc'.
+    # Existing databases need the constraint added by hand:
+    #   ALTER TABLE books ADD CONSTRAINT uq_books_title_author UNIQUE (title, author);
+    __table_args__ = (
+        UniqueConstraint('title', 'author', name='uq_books_title_author'),
+        Index('ix_books_title_id', 'title', 'id'),
+        Index('ix_books_author_id', 'author', 'id'),
+    )
+
+    def json(self):
+        return {'id': self.id, 'title': self.title, 'author': self.author}
+
+# Columns the listing can be sorted on (and seeked by in cursor mode)
+SORT_COLUMNS = {'id': Book.id, 'title': Book.title, 'author': Book.author}
+SORT_ORDERS = ('asc', 'desc')
+
+# Fields ?fields= can select, in Book.json() order
+FIELDS = ('id', 'title', 'author')
+
+def parse_fields(value):
+    """Validate a ?fields= value: a tuple in FIELDS order, or None for every field.
+
+    Raises ValueError naming the unknown fields.
+    """
+    if value is None:
+        return None
+    requested = {part.strip() for part in value.split(',') if part.strip()}
+    unknown = requested.difference(FIELDS)
+    if unknown:
+        raise ValueError(f"Unknown fields: {','.join(sorted(unknown))} (choose from {','.join(FIELDS)})")
+    if not requested:
+        raise ValueError(f"fields must name at least one of {','.join(FIELDS)}")
+    if len(requested) == len(FIELDS):
+        return None
+    return tuple(name for name in FIELDS if name in requested)
+
+# --- STATEMENTS ---
+books = Book.__table__
+# Same field order as Book.json(), so dict(row._mapping) serializes unchanged
+COLUMNS = (books.c.id, books.c.title, books.c.author)
+
+@functools.lru_cache(maxsize=None)
+def select_fields(fields, shape='all'):
+    """SELECT of just these fields, built once per (fields, shape).
+
+    shape: 'all' (unordered), 'in_id_order' or 'by_id' (WHERE id = :id).
+    """
+    stmt = select(*(books.c[name] for name in fields))
+    if shape == 'in_id_order':
+        return stmt.order_by(books.c.id)
+    if shape == 'by_id':
+        return stmt.where(books.c.id == bindparam('id'))
+    return stmt
+
+BY_ID = PreparedQuery(
+    'books_by_id', (('id', 'integer'),),
+    'SELECT id, title, author FROM books WHERE id = $1',
+    select(*COLUMNS).where(books.c.id == bindparam('id')),
+)
+BY_IDS = PreparedQuery(
+    'books_by_ids', (('ids', 'integer[]'),),
+    'SELECT id, title, author FROM books WHERE id = ANY($1)',
+    select(*COLUMNS).where(books.c.id == any_(bindparam('ids', type_=ARRAY(Integer)))),
+)
+# No row back means (title, author) already existed
+CREATE = PreparedQuery(
+    'books_create', (('title', 'text'), ('author', 'text')),
+    'INSERT INTO books (title, author) VALUES ($1, $2) ON CONFLICT DO NOTHING RETURNING id, title, author',
+    insert(books).on_conflict_do_nothing().returning(*COLUMNS),
+)
+# executemany: VALUES come from the parameter dicts
+INSERT_MANY = insert(books).on_conflict_do_nothing().returning(*COLUMNS)
+# SET comes from the parameter keys other than book_id
+UPDATE = update(books).where(books.c.id == bindparam('book_id')).returning(*COLUMNS)
+
+# --- QUERIES ---
+def get_book(session, book_id, fields=None):
+    """Row (id, title, author), or just fields, or None."""
+    if fields is not None:
+        return session.execute(select_fields(fields, 'by_id'), {'id': book_id}).first()
+    return BY_ID.execute(session.connection(), {'id': book_id}).first()
+
+def get_books(session, ids):
+    """Rows for the ids that exist, in no particular order."""
+    return BY_IDS.execute(session.connection(), {'ids': ids}).all()
+
+def list_books(session, fields=None):
+    return session.execute(select_fields(fields or FIELDS)).all()
+
+def iter_book_batches(session, batch_size, fields=None):
+    """Yield lists of rows (all fields or just fields) in id order, batch_size at a time.
+
+    yield_per turns on stream_results, so rows come from a server-side
+    cursor instead of being buffered in full by the driver.
+    """
+    stmt = select_fields(fields or FIELDS, 'in_id_order')
+    return session.execute(stmt, execution_options={'yield_per': batch_size}).partitions()
+
+def book_filters(title_pattern=None, author_pattern=None):
+    """WHERE conditions for the listing filters: ILIKE patterns escaped with backslashes."""
+    conditions = []
+    if title_pattern:
+        conditions.append(Book.title.ilike(title_pattern, escape='\\'))
+    if author_pattern:
+        conditions.append(Book.author.ilike(author_pattern, escape='\\'))
+    return conditions
+
+def filtered_select(conditions):
+    """Unordered SELECT of the books matching conditions (what a total counts)."""
+    return select(*COLUMNS).where(*conditions)
+
+def count_books(session, conditions):
+    return session.execute(select(func.count()).select_from(books).where(*conditions)).scalar()
+
+def page_books(session, conditions, sort, order, limit, offset=0, after=None):
+    """Up to limit rows sorted by (sort, id), past the (value, last_id) cursor if given.
+
+    sort and order must already be in SORT_COLUMNS / SORT_ORDERS: callers
+    check them up front and answer 400 instead.
+    """
+    column = SORT_COLUMNS[sort]
+    stmt = filtered_select(conditions)
+    # Seek past the cursor with WHERE (sort_col, id) > (...) instead of OFFSET
+    if after is not None:
+        value, last_id = after
+        if sort == 'id':
+            key, bound = Book.id, last_id
+        else:
+            key, bound = tuple_(column, Book.id), tuple_(value, last_id)
+        stmt = stmt.where(key > bound if order == 'asc' else key < bound)
+    if order == 'asc':
+        stmt = stmt.order_by(column.asc(), Book.id.asc())
+    else:
+        stmt = stmt.order_by(column.desc(), Book.id.desc())
+    if offset:
+        stmt = stmt.offset(offset)
+    return session.execute(stmt.limit(limit)).all()
+
+# --- WRITES ---
+def create_book(session, title, author):
+    """Inserted row, or None when (title, author) already exists."""
+    return CREATE.execute(session.connection(), {'title': title, 'author': author}).first()
+
+def insert_books(session, pairs):
+    """executemany INSERT ... ON CONFLICT DO NOTHING RETURNING of (title, author) pairs.
+
+    Returns {(title, author): row} for the rows created; pairs must be distinct.
+    """
+    rows = [{'title': title, 'author': author} for title, author in pairs]
+    return {(row.title, row.author): row for row in session.execute(INSERT_MANY, rows)}
+
+def update_book(session, book_id, values):
+    """Updated row, or None if book_id doesn't exist; raises IntegrityError on a duplicate.
+
+    values holds the columns to set (title and/or author, not empty).
+    """
+    return session.execute(UPDATE, {'book_id': book_id, **values}).first()
+
+def delete_book(session, book_id):
+    stmt = lambda_stmt(lambda: books.delete().where(books.c.id == book_id).returning(books.c.id))
+    return session.execute(stmt).first() is not None
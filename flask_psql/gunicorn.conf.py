@@ -0,0 +1,54 @@
+"""Production serving for the Flask books apps (app.py, new_flask/app.py).
+
+    gunicorn -c gunicorn.conf.py app:app              # from flask_psql/
+    gunicorn -c ../gunicorn.conf.py app:app           # from flask_psql/new_flask/
+
+Everything is read from the environment:
+
+    WEB_CONCURRENCY            worker processes          (default: 2 x CPUs + 1)
+    GUNICORN_THREADS           threads per worker        (default: 1, sync workers)
+    GUNICORN_BIND              listen address            (default: 0.0.0.0:$PORT, PORT default 5000)
+    GUNICORN_TIMEOUT           seconds before a stuck request's worker is killed (default: 30)
+    GUNICORN_GRACEFUL_TIMEOUT  seconds in-flight requests get to finish on shutdown (default: 30)
+    GUNICORN_KEEPALIVE         seconds to hold idle keep-alive connections (default: 5)
+    GUNICORN_MAX_REQUESTS      recycle a worker after N requests, 0 off (default: 0)
+
+The app is imported once in the master (preload) and forked; importing it
+opens no connections, and each worker still drops any inherited pool
+after the fork. SIGTERM stops accepting connections and lets in-flight
+requests drain for GUNICORN_GRACEFUL_TIMEOUT seconds before workers exit.
+Each worker keeps its own DB_POOL_SIZE connections and its own /metrics.
+"""
+import multiprocessing
+import os
+
+bind = os.environ.get('GUNICORN_BIND', f"0.0.0.0:{os.environ.get('PORT', 5000)}")
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.environ.get('GUNICORN_THREADS', 1))
+worker_class = 'gthread' if threads > 1 else 'sync'
+preload_app = True
+
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', 5))
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 0))
+max_requests_jitter = max_requests // 10
+
+accesslog = '-'
+
+def _engines(worker):
+    flask_app = worker.app.wsgi()
+    with flask_app.app_context():
+        engines = list(flask_app.extensions['sqlalchemy'].engines.values())
+    return engines + flask_app.extensions['replicas'].engines
+
+def post_fork(server, worker):
+    # Pooled connections are sockets: one shared across processes corrupts
+    # both sides. close=False leaves the parent's connections alone.
+    for engine in _engines(worker):
+        engine.dispose(close=False)
+
+def worker_exit(server, worker):
+    # Close this worker's connections instead of leaving them to time out
+    for engine in _engines(worker):
+        engine.dispose()
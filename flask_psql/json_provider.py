@@ -0,0 +1,58 @@
+"""orjson encoding for the JSON_FAST_PATH=1 list responses.
+
+orjson is an optional dependency (pip install orjson), only imported when
+the fast path is switched on. Its output matches json.dumps byte for byte
+except in a few cases, and dumps() falls back to json.dumps for each of
+them, so switching the fast path on never changes a response body:
+
+* very small or large floats (json "1e-05" and "1e+16", orjson "0.00001" and "1e16")
+* non-ASCII text when the caller wants ensure_ascii (Flask's default)
+* anything orjson refuses (non-str keys, ints beyond 64 bits)
+"""
+import importlib.util
+import re
+
+from flask.json.provider import DefaultJSONProvider
+
+# Every float orjson writes differently from json.dumps matches this; text that
+# merely looks like one costs a fallback, never a wrong byte
+_FLOAT_MISMATCH = re.compile(rb'[0-9]e[-0-9]|0\.0000')
+
+def require_orjson():
+    """Fail at startup, not on every list request, when JSON_FAST_PATH=1 lacks orjson."""
+    if importlib.util.find_spec('orjson') is None:
+        raise RuntimeError('JSON_FAST_PATH=1 needs orjson: pip install orjson, or unset JSON_FAST_PATH')
+
+def dumps(obj, sort_keys=False, ensure_ascii=False, default=None):
+    """orjson bytes for obj, or None where json.dumps would write something else."""
+    import orjson
+
+    # Dates go through default, like json.dumps, instead of orjson's RFC 3339
+    option = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS
+    if sort_keys:
+        option |= orjson.OPT_SORT_KEYS
+    try:
+        data = orjson.dumps(obj, default=default, option=option)
+    except orjson.JSONEncodeError:
+        return None
+    if ensure_ascii and not data.isascii():
+        return None
+    if _FLOAT_MISMATCH.search(data):
+        return None
+    return data
+
+class ORJSONProvider(DefaultJSONProvider):
+    """jsonify() through orjson; same bytes as DefaultJSONProvider.
+
+    Install with app.json = ORJSONProvider(app). Pretty-printed (debug)
+    responses keep going through json.dumps.
+    """
+
+    def response(self, *args, **kwargs):
+        if (self.compact is None and self._app.debug) or self.compact is False:
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        data = dumps(obj, sort_keys=self.sort_keys, ensure_ascii=self.ensure_ascii, default=self.default)
+        if data is None:
+            data = self.dumps(obj, separators=(',', ':')).encode()
+        return self._app.response_class(data + b'\n', mimetype=self.mimetype)
@@ -0,0 +1,160 @@
+"""Per-route request metrics and per-request SQL statement counts.
+
+Request middleware calls start_request() / finish_request(); SQLAlchemy
+cursor events (installed once on the Engine class, so every engine is
+covered) add each statement's count and duration to the request that ran it.
+render() returns everything in the Prometheus text exposition format.
+"""
+from contextvars import ContextVar
+import threading
+import time
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Statements per request: anything past a handful on a single-item route smells like N+1
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+# Rows per group-commit transaction
+BATCH_SIZE_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+INF_LE = 'le="+Inf"'
+
+_lock = threading.Lock()
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _labels(names, values, extra=''):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+class Counter:
+    def __init__(self, name, help, labelnames):
+        self.name, self.help, self.labelnames = name, help, labelnames
+        self.values = {}
+
+    def inc(self, labels, amount=1):
+        with _lock:
+            self.values[labels] = self.values.get(labels, 0) + amount
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} counter']
+        with _lock:
+            for labels, value in sorted(self.values.items()):
+                lines.append(f'{self.name}{_labels(self.labelnames, labels)} {value}')
+        return lines
+
+class Histogram:
+    def __init__(self, name, help, labelnames, buckets):
+        self.name, self.help, self.labelnames, self.buckets = name, help, labelnames, buckets
+        self.series = {}  # labels -> [bucket counts..., +Inf count, sum]
+
+    def observe(self, labels, value):
+        with _lock:
+            series = self.series.setdefault(labels, [0] * (len(self.buckets) + 1) + [0.0])
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[len(self.buckets)] += 1
+            series[-1] += value
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} histogram']
+        with _lock:
+            for labels, series in sorted(self.series.items()):
+                for bound, count in zip(self.buckets, series):
+                    le = f'le="{bound}"'
+                    lines.append(f'{self.name}_bucket{_labels(self.labelnames, labels, le)} {count}')
+                total = series[len(self.buckets)]
+                lines.append(f'{self.name}_bucket{_labels(self.labelnames, labels, INF_LE)} {total}')
+                lines.append(f'{self.name}_sum{_labels(self.labelnames, labels)} {series[-1]:.6f}')
+                lines.append(f'{self.name}_count{_labels(self.labelnames, labels)} {total}')
+        return lines
+
+REQUESTS = Counter('http_requests_total', 'HTTP requests by route and status.', ('method', 'route', 'status'))
+LATENCY = Histogram(
+    'http_request_duration_seconds', 'Request latency by route.', ('method', 'route'), LATENCY_BUCKETS
+)
+DB_QUERIES = Histogram(
+    'db_queries_per_request', 'SQL statements executed per request.', ('method', 'route'), QUERY_COUNT_BUCKETS
+)
+DB_TIME = Histogram(
+    'db_time_per_request_seconds', 'Time spent in SQL statements per request.', ('method', 'route'), LATENCY_BUCKETS
+)
+GROUP_COMMIT_BATCH = Histogram(
+    'db_group_commit_batch_size', 'Rows inserted per group-commit transaction.', ('table',), BATCH_SIZE_BUCKETS
+)
+# Only counted when DATABASE_REPLICA_URLS is set
+REPLICA_READS = Counter(
+    'db_read_routing_total', 'Reads by the database they were sent to (replica, primary_sticky, primary_fallback).', ('target',)
+)
+ADMISSION_SHED = Counter(
+    'http_requests_shed_total', 'Requests rejected with 503 by admission control.', ('priority', 'reason')
+)
+# Only counted when CHANGE_FEED is set
+CHANGE_EVENTS = Counter(
+    'change_feed_events_total', 'Change events applied from other workers, by channel.', ('channel',)
+)
+METRICS = (REQUESTS, LATENCY, DB_QUERIES, DB_TIME, GROUP_COMMIT_BATCH, REPLICA_READS, ADMISSION_SHED, CHANGE_EVENTS)
+
+# --- PER-REQUEST SQL ACCOUNTING ---
+class RequestStats:
+    __slots__ = ('started', 'queries', 'db_seconds', 'route')
+
+    def __init__(self, route=None):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.route = route  # "METHOD /route/{template}", once known
+
+_current = ContextVar('request_stats', default=None)
+
+def start_request(route=None):
+    """Begin accounting for the current request; returns a token for finish_request."""
+    return _current.set(RequestStats(route))
+
+def set_route(route):
+    """Name the current request's route, for apps that only know it after routing."""
+    stats = _current.get()
+    if stats is not None:
+        stats.route = route
+
+def current_route():
+    """Route of the request running on this thread/task, or None outside one."""
+    stats = _current.get()
+    return stats.route if stats is not None else None
+
+def finish_request(token, method, route, status):
+    stats = _current.get()
+    _current.reset(token)
+    if stats is None:
+        return
+    labels = (method, route)
+    REQUESTS.inc((method, route, str(status)))
+    LATENCY.observe(labels, time.perf_counter() - stats.started)
+    DB_QUERIES.observe(labels, stats.queries)
+    DB_TIME.observe(labels, stats.db_seconds)
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info['query_started'] = time.perf_counter()
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _current.get()
+    started = conn.info.pop('query_started', None)
+    if stats is not None and started is not None:
+        stats.queries += 1
+        stats.db_seconds += time.perf_counter() - started
+
+def render():
+    lines = []
+    for metric in METRICS:
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
+
+# Content-Type for the /metrics responses
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
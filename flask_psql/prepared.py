@@ -0,0 +1,57 @@
+"""Server-side prepared statements for fixed query shapes.
+
+psycopg2 sends every query as plain text, so Postgres parses, analyzes and
+plans each one again. For the hottest fixed-shape queries (fetch by id,
+multi-get, single insert) PreparedQuery runs EXECUTE on a statement that
+each pooled connection PREPAREs on first use, so repeat calls skip straight
+to execution. The PREPARE travels in the same round trip as that first
+EXECUTE, so it costs no extra statement.
+
+    DB_PREPARED_STATEMENTS  1 to PREPARE on Postgres (default: 1); set 0
+                            behind a transaction-pooling pgbouncer, where
+                            a connection's prepared statements aren't its own
+
+On other databases, or when disabled, the equivalent SQLAlchemy statement
+runs instead (cached compiled SQL, but no server-side plan).
+"""
+import os
+
+ENABLED = os.environ.get('DB_PREPARED_STATEMENTS', '1') == '1'
+
+# Names PREPAREd on a DBAPI connection, in that connection's pool record:
+# it goes away with the connection when the pool invalidates or recycles it
+INFO_KEY = 'prepared_statements'
+
+class PreparedQuery:
+    def __init__(self, name, params, sql, fallback):
+        # params: (name, Postgres type) per $n placeholder of sql, in order
+        self.name = name
+        self.params = params
+        self.sql = sql
+        self.fallback = fallback
+        types = ', '.join(pg_type for _, pg_type in params)
+        self._prepare = f'PREPARE {name} ({types}) AS {sql}; '
+        placeholders = ', '.join(f'%({key})s' for key, _ in params)
+        self._execute = f'EXECUTE {name}({placeholders})'
+
+    def execute(self, conn, values):
+        """Run on a SQLAlchemy Connection (session.connection()); returns the Result."""
+        if not ENABLED or conn.dialect.name != 'postgresql':
+            return conn.execute(self.fallback, values)
+        info = conn.connection.info
+        prepared = info.setdefault(INFO_KEY, set())
+        if prepared is None:
+            # A first use failed part way: ask the server what it has
+            prepared = info[INFO_KEY] = {
+                name for (name,) in conn.exec_driver_sql('SELECT name FROM pg_prepared_statements')
+            }
+        if self.name in prepared:
+            return conn.exec_driver_sql(self._execute, values)
+        try:
+            result = conn.exec_driver_sql(self._prepare + self._execute, values)
+        except Exception:
+            # PREPARE isn't transactional: it may have stuck even though EXECUTE failed
+            info[INFO_KEY] = None
+            raise
+        prepared.add(self.name)
+        return result
@@ -0,0 +1,188 @@
+"""Slow-query log with EXPLAIN capture, configured from the environment.
+
+    SLOW_QUERY_MS        log statements slower than this, 0 off               (default: 0)
+    SLOW_QUERY_EXPLAIN   1 to capture EXPLAIN (FORMAT JSON) for the first slow
+                         run of each statement fingerprint                    (default: 0)
+    SLOW_QUERY_PARAMS    redacted: strings logged as their length only;
+                         full: values as bound, long ones truncated           (default: redacted)
+    SLOW_QUERY_BUFFER    reports kept in memory for the admin endpoint        (default: 100)
+    ADMIN_TOKEN          the admin endpoint wants it in X-Admin-Token (unset: 403)
+
+Cursor events on the Engine class time every statement on every engine
+(primary, replicas, group commit). A slow one is logged to the
+"slow_queries" logger with its duration, the route of the request that ran
+it and its redacted parameters, and the report goes into a ring buffer.
+
+The fingerprint is the statement with parameter names, literals and
+repeated VALUES tuples normalized away, so one query shape is one
+fingerprint whatever its arguments. EXPLAIN (never ANALYZE: it doesn't run
+the statement again) goes through the same connection and transaction, so
+temp tables and the same snapshot apply, inside a SAVEPOINT so a failed
+EXPLAIN can't abort the request's transaction. Postgres only.
+"""
+from collections import deque
+import hashlib
+import hmac
+import logging
+import os
+import re
+import threading
+import time
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+import metrics
+
+ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN')
+TOKEN_HEADER = 'X-Admin-Token'
+# Longest statement text and string parameter kept in a report
+MAX_STATEMENT_CHARS = 4000
+MAX_PARAM_CHARS = 200
+# Statements EXPLAIN accepts; anything else (COPY, DDL, multi-statement) is only logged
+EXPLAINABLE = re.compile(r'^\s*(SELECT|WITH|INSERT|UPDATE|DELETE|EXECUTE)\b', re.IGNORECASE)
+
+logger = logging.getLogger('slow_queries')
+
+STARTED_KEY = 'slow_query_started'
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info[STARTED_KEY] = time.perf_counter()
+
+_PARAM = re.compile(r'%\(([^)]+)\)s|\$\d+|\?|:\w+')
+_LITERAL = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_REPEATED_TUPLES = re.compile(r'(\([^()]*\))(?:\s*,\s*\1)+')
+_SPACE = re.compile(r'\s+')
+
+def fingerprint(statement):
+    """Short hash of the statement shape (see the module docstring)."""
+    shape = _SPACE.sub(' ', statement).strip()
+    shape = _LITERAL.sub('?', _PARAM.sub('?', shape))
+    shape = _REPEATED_TUPLES.sub(r'\1', shape)
+    return hashlib.blake2b(shape.encode(), digest_size=8).hexdigest()
+
+def redact(value, full=False):
+    """A parameter value as logged: strings become <str len=N> unless full."""
+    if isinstance(value, dict):
+        return {key: redact(item, full) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [redact(item, full) for item in value]
+    if value is None or isinstance(value, (bool, int, float)):
+        return value
+    if isinstance(value, str) and full:
+        return value if len(value) <= MAX_PARAM_CHARS else value[:MAX_PARAM_CHARS] + '...'
+    size = len(value) if hasattr(value, '__len__') else None
+    return f'<{type(value).__name__} len={size}>' if size is not None else f'<{type(value).__name__}>'
+
+def authorized(token):
+    """Whether a request sending this X-Admin-Token value may read the reports.
+
+    Reports hold SQL, plans and possibly bound values: without ADMIN_TOKEN
+    nobody may read them.
+    """
+    return ADMIN_TOKEN is not None and token is not None and hmac.compare_digest(token, ADMIN_TOKEN)
+
+class SlowQueryLog:
+    def __init__(self, threshold_ms=0.0, explain=False, full_params=False, buffer_size=100):
+        self.threshold_ms = threshold_ms
+        self.explain = explain
+        self.full_params = full_params
+        self.reports = deque(maxlen=buffer_size)
+        self.logged = 0
+        self._explained = set()  # fingerprints EXPLAIN has run (or is running) for
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.threshold_ms > 0
+
+    def install(self):
+        """Check statements on every engine against the threshold (call once per process)."""
+        event.listen(Engine, 'after_cursor_execute', self._after_cursor_execute)
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        started = conn.info.get(STARTED_KEY)
+        if not self.enabled or started is None:
+            return
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        if elapsed_ms < self.threshold_ms:
+            return
+        key = fingerprint(statement)
+        report = {
+            'at': time.time(),
+            'duration_ms': round(elapsed_ms, 3),
+            'route': metrics.current_route(),
+            'fingerprint': key,
+            'statement': statement[:MAX_STATEMENT_CHARS],
+            # executemany: the first row's parameters stand for the batch
+            'parameters': redact(parameters[0] if executemany and parameters else parameters, self.full_params),
+            'executemany': executemany,
+            'plan': None,
+        }
+        if self.explain and not executemany and self._first(key):
+            report['plan'] = explain(conn, statement, parameters)
+        with self._lock:
+            self.logged += 1
+            self.reports.append(report)
+        logger.warning(
+            'slow query %.1f ms route=%s fingerprint=%s: %s params=%s',
+            elapsed_ms, report['route'], key, _SPACE.sub(' ', report['statement']), report['parameters'],
+        )
+
+    def _first(self, key):
+        with self._lock:
+            if key in self._explained:
+                return False
+            self._explained.add(key)
+            return True
+
+    def status(self):
+        """Settings plus the buffered reports, newest first, for the admin endpoints."""
+        with self._lock:
+            reports = list(reversed(self.reports))
+        return {
+            'threshold_ms': self.threshold_ms,
+            'explain': self.explain,
+            'params': 'full' if self.full_params else 'redacted',
+            'logged': self.logged,
+            'buffered': len(reports),
+            'reports': reports,
+        }
+
+def explain(conn, statement, parameters):
+    """EXPLAIN (FORMAT JSON) plan of statement, or {"error": ...} when it can't be had.
+
+    Runs on the DBAPI connection, so it isn't timed, counted or logged itself.
+    """
+    if conn.dialect.name != 'postgresql' or not EXPLAINABLE.match(statement) or ';' in statement:
+        return {'error': 'not explainable'}
+    dbapi_conn = conn.connection.dbapi_connection
+    # Outside a transaction (autocommit) a failure can't poison anything
+    savepoint = not getattr(dbapi_conn, 'autocommit', False)
+    try:
+        with dbapi_conn.cursor() as cursor:
+            if savepoint:
+                cursor.execute('SAVEPOINT slow_query_explain')
+            try:
+                cursor.execute('EXPLAIN (FORMAT JSON) ' + statement, parameters)
+                plan = cursor.fetchone()[0]
+            except Exception as e:
+                if savepoint:
+                    cursor.execute('ROLLBACK TO SAVEPOINT slow_query_explain')
+                return {'error': str(e).strip()}
+            finally:
+                if savepoint:
+                    cursor.execute('RELEASE SAVEPOINT slow_query_explain')
+    except Exception as e:
+        return {'error': str(e).strip()}
+    return plan[0] if isinstance(plan, list) else plan
+
+def make_slow_query_log():
+    """SlowQueryLog from SLOW_QUERY_* (logs nothing while SLOW_QUERY_MS is 0)."""
+    return SlowQueryLog(
+        float(os.environ.get('SLOW_QUERY_MS', 0)),
+        os.environ.get('SLOW_QUERY_EXPLAIN', '0') == '1',
+        os.environ.get('SLOW_QUERY_PARAMS', 'redacted') == 'full',
+        int(os.environ.get('SLOW_QUERY_BUFFER', 100)),
+    )